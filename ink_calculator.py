@@ -15,11 +15,24 @@ Supported Printing Methods:
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 from datetime import datetime
 from dataclasses import dataclass, field
 from typing import Optional, List, Dict, Tuple
 from enum import Enum
+from operator import attrgetter
+from pathlib import Path
 import json
+import logging
+import re
+import uuid
+
+try:
+    import orjson  # optional: faster encoder for the JSON report
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -38,6 +51,10 @@ st.set_page_config(
 
 CM2_TO_M2 = 1e-4
 
+TAB_LABELS = ("Consumption", "Pantone Mix", "Reference Data", "History")
+REFERENCE_TAB_LABELS = ("Print Methods", "Ink Specifications", "Coverage Guidelines")
+FOOTER_CAPTION = "Ink Consumption Calculator | Formula: Area × Coverage × Density × Substrate Factor"
+
 class PrintMethod(Enum):
     OFFSET_SHEET_FED = "Offset - Sheet-fed"
     OFFSET_HEAT_SET = "Offset - Heat-set"
@@ -55,6 +72,8 @@ class PrintMethod(Enum):
     SECURITY_UV_FLUORESCENT = "Security - UV Fluorescent"
     SECURITY_MAGNETIC = "Security - Magnetic"
 
+PRINT_METHODS = tuple(PrintMethod)
+
 # Technical specifications from industry standards
 # Source: ISO/TS 19857, manufacturer datasheets, industry research
 INK_SPECIFICATIONS = {
@@ -241,6 +260,13 @@ BASE_COLOR_SPECIFICATIONS = {
     },
 }
 
+BASE_COLORS = tuple(BASE_COLOR_SPECIFICATIONS)
+
+BASE_COLOR_DEFAULT_PRICE = {
+    color: (data["price_range"][0] + data["price_range"][1]) / 2
+    for color, data in BASE_COLOR_SPECIFICATIONS.items()
+}
+
 DEFAULT_PANTONE_FORMULAS = {
     "185 C (Red)": {"C": 0, "M": 80, "Y": 90, "K": 0, "Orange": 0, "Green": 0, "Violet": 0, "Special": 0},
     "2945 C (Blue)": {"C": 100, "M": 45, "Y": 0, "K": 0, "Orange": 0, "Green": 0, "Violet": 0, "Special": 0},
@@ -252,11 +278,79 @@ DEFAULT_PANTONE_FORMULAS = {
     "Process Black": {"C": 0, "M": 0, "Y": 0, "K": 100, "Orange": 0, "Green": 0, "Violet": 0, "Special": 0},
 }
 
+PRESET_ACTIVE_COMPONENTS = {
+    name: {k: v for k, v in formula.items() if v > 0}
+    for name, formula in DEFAULT_PANTONE_FORMULAS.items()
+}
+# First four presets are standard formulas, the rest are process colors
+PRESET_LINES = tuple(f"{name}: {active}" for name, active in PRESET_ACTIVE_COMPONENTS.items())
+PRESET_STANDARD_LINES = PRESET_LINES[:4]
+PRESET_PROCESS_LINES = PRESET_LINES[4:]
+
+METHOD_DESCRIPTION_MD = {
+    method: f"""
+**Description:** {specs['description']}
+
+**Technical Data:**
+- Density Range: {specs['density_range'][0]} - {specs['density_range'][1]} {specs['unit']}
+- Typical Value: {specs['typical']} {specs['unit']}
+- Viscosity: {specs.get('viscosity', 'N/A')}
+"""
+    for method, specs in INK_SPECIFICATIONS.items()
+}
+
+METHOD_VARIANTS_MD = {
+    method: "**Variants:**\n\n" + "\n".join(
+        f"- **{variant}:** Density {data['density'][0]}-{data['density'][1]} g/m²"
+        for variant, data in specs['variants'].items()
+    )
+    for method, specs in INK_SPECIFICATIONS.items()
+    if 'variants' in specs
+}
+
+# Result templates filled with str.format; fields are ConsumptionResult (r) / PantoneMixture (m)
+CALCULATION_DETAILS_LEFT_MD = """
+**Method:** {r.print_method.value}
+**Area:** {r.area_cm2:.2f} cm² ({r.area_m2:.6f} m²)
+**Coverage:** {r.coverage}%
+**Ink Density:** {r.ink_density} g/m²
+**Substrate Factor:** {r.substrate_factor}
+**Waste Rate:** {r.waste_rate}%
+"""
+
+CALCULATION_DETAILS_RIGHT_MD = """
+**Quantity:** {r.quantity:,}
+**Ink Price:** ${r.ink_price_per_kg:.2f}/kg
+**Formula:** {r.area_m2:.6f} × {coverage_fraction} × {r.ink_density} × {r.substrate_factor}
+**Base Consumption:** {r.base_consumption_g:.4f} g
+**With Waste:** {r.actual_consumption_g:.4f} g
+"""
+
+MIXTURE_SUMMARY_MD = """
+**{m.name}**
+
+Total Cost: **${m.total_cost:,.2f}**
+
+Unit Cost: **${m.unit_cost:,.2f}/kg**
+"""
+
+SUBSTRATE_OPTIONS = (
+    ("Coated Paper (factor: 1.0)", 1.0),
+    ("Uncoated Paper (factor: 1.2)", 1.2),
+    ("Cardboard (factor: 1.3)", 1.3),
+    ("Plastic Film (factor: 0.9)", 0.9),
+    ("Metallized (factor: 0.8)", 0.8),
+    ("Synthetic Paper (factor: 1.0)", 1.0),
+    ("Security Paper (factor: 1.1)", 1.1),
+)
+SUBSTRATE_LABELS = tuple(label for label, _ in SUBSTRATE_OPTIONS)
+SUBSTRATE_FACTORS = dict(SUBSTRATE_OPTIONS)
+
 # ---------------------------------------------------------------------------
 # Data Classes
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class ConsumptionResult:
     print_method: PrintMethod
     area_cm2: float
@@ -268,92 +362,119 @@ class ConsumptionResult:
     ink_price_per_kg: float
     anilox_volume: Optional[float] = None
     substrate_factor: float = 1.0
+    _base_g: float = field(init=False, repr=False)
+    _actual_g: float = field(init=False, repr=False)
+    _total_kg: float = field(init=False, repr=False)
+    _total_cost: float = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        # Each stage of the formula is evaluated once instead of on every property access
+        self._base_g = self.area_m2 * (self.coverage / 100) * self.ink_density * self.substrate_factor
+        self._actual_g = self._base_g * (1 + self.waste_rate / 100)
+        self._total_kg = (self._actual_g * self.quantity) / 1000
+        self._total_cost = self._total_kg * self.ink_price_per_kg
     
     @property
     def base_consumption_g(self) -> float:
-        return self.area_m2 * (self.coverage / 100) * self.ink_density * self.substrate_factor
+        return self._base_g
     
     @property
     def actual_consumption_g(self) -> float:
-        return self.base_consumption_g * (1 + self.waste_rate / 100)
+        return self._actual_g
     
     @property
     def total_consumption_kg(self) -> float:
-        return (self.actual_consumption_g * self.quantity) / 1000
+        return self._total_kg
     
     @property
     def total_cost(self) -> float:
-        return self.total_consumption_kg * self.ink_price_per_kg
+        return self._total_cost
     
     @property
     def unit_cost(self) -> float:
-        return self.total_cost / self.quantity if self.quantity > 0 else 0
+        return self._total_cost / self.quantity if self.quantity > 0 else 0
     
-    def to_dict(self) -> Dict:
+    def to_dict(self, timestamp: str) -> Dict:
         return {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "timestamp": timestamp,
             "print_method": self.print_method.value,
-            "area_cm2": round(self.area_cm2, 2),
-            "area_m2": round(self.area_m2, 6),
+            "area_cm2": self.area_cm2,
+            "area_m2": self.area_m2,
             "coverage_pct": self.coverage,
             "ink_density_g_m2": self.ink_density,
             "quantity": self.quantity,
             "waste_rate_pct": self.waste_rate,
             "ink_price_per_kg": self.ink_price_per_kg,
             "substrate_factor": self.substrate_factor,
-            "consumption_per_print_g": round(self.actual_consumption_g, 4),
-            "total_consumption_kg": round(self.total_consumption_kg, 4),
-            "total_cost": round(self.total_cost, 2),
-            "unit_cost": round(self.unit_cost, 4),
+            "consumption_per_print_g": self._actual_g,
+            "total_consumption_kg": self._total_kg,
+            "total_cost": self._total_cost,
+            "unit_cost": self.unit_cost,
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class PantoneMixture:
     name: str
     total_kg: float
-    components: Dict[str, float]
-    unit_prices: Dict[str, float]
+    # Parallel sequences: percentages[i] and prices[i] belong to colors[i]
+    colors: Tuple[str, ...]
+    percentages: Tuple[float, ...]
+    prices: Tuple[float, ...]
+    _costs: List[Dict] = field(init=False, repr=False)
+    _total_cost: float = field(init=False, repr=False)
+    _total_percentage: float = field(init=False, repr=False)
+    
+    def __post_init__(self):
+        # Cost breakdown is computed once; the cost panel reads it several times per render
+        percentages = np.asarray(self.percentages, dtype=np.float64)
+        self._total_percentage = float(percentages.sum())
+        prices = np.asarray(self.prices, dtype=np.float64)
+        weights = self.total_kg * percentages * 0.01
+        costs = weights * prices
+        
+        self._costs = [
+            {
+                "color": self.colors[i],
+                "percentage": self.percentages[i],
+                "weight_kg": round(float(weights[i]), 4),
+                "unit_price": self.prices[i],
+                "cost": round(float(costs[i]), 2),
+            }
+            for i in np.flatnonzero(percentages > 0)
+        ]
+        self._total_cost = float(costs.sum())
+    
+    @property
+    def components(self) -> Dict[str, float]:
+        return dict(zip(self.colors, self.percentages))
     
     @property
     def total_percentage(self) -> float:
-        return sum(self.components.values())
+        return self._total_percentage
     
     @property
     def is_valid(self) -> bool:
-        return abs(self.total_percentage - 100) < 0.01
+        return abs(self._total_percentage - 100) < 0.01
     
     def calculate_costs(self) -> List[Dict]:
-        results = []
-        for color, percentage in self.components.items():
-            if percentage > 0:
-                weight_kg = self.total_kg * (percentage / 100)
-                unit_price = self.unit_prices.get(color, 0)
-                cost = weight_kg * unit_price
-                results.append({
-                    "color": color,
-                    "percentage": percentage,
-                    "weight_kg": round(weight_kg, 4),
-                    "unit_price": unit_price,
-                    "cost": round(cost, 2),
-                })
-        return results
+        return self._costs
     
     @property
     def total_cost(self) -> float:
-        return sum(item["cost"] for item in self.calculate_costs())
+        return self._total_cost
     
     @property
     def unit_cost(self) -> float:
-        return self.total_cost / self.total_kg if self.total_kg > 0 else 0
+        return self._total_cost / self.total_kg if self.total_kg > 0 else 0
     
-    def to_dict(self) -> Dict:
+    def to_dict(self, timestamp: str) -> Dict:
         return {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "timestamp": timestamp,
             "mixture_name": self.name,
             "total_weight_kg": self.total_kg,
-            "unit_cost_per_kg": round(self.unit_cost, 2),
-            "total_cost": round(self.total_cost, 2),
+            "unit_cost_per_kg": self.unit_cost,
+            "total_cost": self._total_cost,
             "formula": json.dumps(self.components),
         }
 
@@ -362,14 +483,249 @@ class PantoneMixture:
 # Session State Management
 # ---------------------------------------------------------------------------
 
+# Records keep full precision in memory; tables, exports and the history log round per column
+HISTORY_ROUNDING = {
+    "area_cm2": 2,
+    "area_m2": 6,
+    "consumption_per_print_g": 4,
+    "total_consumption_kg": 4,
+    "total_cost": 2,
+    "unit_cost": 4,
+    "unit_cost_per_kg": 2,
+}
+
+# Factories rather than values so each session gets its own mutable containers
+SESSION_DEFAULTS = (
+    # Bumped on every history change; lets the export skip re-encoding unchanged history
+    ("history_rev", int),
+    # History key -> (history_rev, DataFrame, CSV bytes) last built for that revision
+    ("history_tables", dict),
+)
+
+# Histories are columnar (column name -> list of values, one entry per record) and
+# backed by an append-only JSONL log per user and key, so they survive app restarts
+# Each history has a fixed column set; every row gets all of them (None where a record
+# lacks one), so the columns always stay the same length
+HISTORY_COLUMNS = {
+    "consumption_history": (
+        "timestamp", "print_method", "area_cm2", "area_m2", "coverage_pct", "ink_density_g_m2",
+        "quantity", "waste_rate_pct", "ink_price_per_kg", "substrate_factor",
+        "consumption_per_print_g", "total_consumption_kg", "total_cost", "unit_cost",
+    ),
+    "pantone_history": (
+        "timestamp", "mixture_name", "total_weight_kg", "unit_cost_per_kg", "total_cost", "formula",
+    ),
+}
+HISTORY_KEYS = tuple(HISTORY_COLUMNS)
+HISTORY_DIR = Path(__file__).resolve().parent / "history"
+HISTORY_USER_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def history_user() -> str:
+    # The user key travels in the URL (?user=...), so reloading or bookmarking the page
+    # finds the same log while other users' sessions never read or clear it
+    user = st.query_params.get("user", "")
+    if not HISTORY_USER_PATTERN.fullmatch(user):
+        user = uuid.uuid4().hex
+        st.query_params["user"] = user
+    return user
+
+
+def history_path(user: str, key: str) -> Path:
+    return HISTORY_DIR / user / f"{key}.jsonl"
+
+
+def add_history_row(history: Dict[str, List], key: str, record: Dict):
+    for column in HISTORY_COLUMNS[key]:
+        history.setdefault(column, []).append(record.get(column))
+
+
+def load_history(user: str, key: str) -> Dict[str, List]:
+    history = {}
+    path = history_path(user, key)
+    if not path.exists():
+        return history
+    
+    text = path.read_text(encoding="utf-8", errors="replace")
+    for line_no, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = None
+        if not isinstance(record, dict):
+            logger.warning("Skipping unreadable history line %d in %s", line_no, path)
+            continue
+        add_history_row(history, key, record)
+    
+    if text and not text.endswith("\n"):
+        # A write was cut off mid-line; end that line so the next append starts on its own
+        with path.open("a", encoding="utf-8") as f:
+            f.write("\n")
+    return history
+
+
 def init_session_state():
-    defaults = {
-        "consumption_history": [],
-        "pantone_history": [],
-    }
-    for key, value in defaults.items():
+    for key, factory in SESSION_DEFAULTS:
+        st.session_state.setdefault(key, factory())
+    # Histories are read from disk once per session, not on every rerun
+    if "history_user" not in st.session_state:
+        st.session_state["history_user"] = history_user()
+    for key in HISTORY_KEYS:
         if key not in st.session_state:
-            st.session_state[key] = value
+            st.session_state[key] = load_history(st.session_state["history_user"], key)
+
+
+def round_record(record: Dict) -> Dict:
+    return {
+        column: round(value, HISTORY_ROUNDING[column]) if isinstance(value, float) and column in HISTORY_ROUNDING else value
+        for column, value in record.items()
+    }
+
+
+def is_repeat_record(history: Dict[str, List], record: Dict) -> bool:
+    # Same values as the latest record apart from when it was taken. Compared as rounded,
+    # because records reloaded from the log only carry the rounded values.
+    if not history:
+        return False
+    latest = round_record({column: values[-1] for column, values in history.items()})
+    return all(
+        column in latest and latest[column] == value
+        for column, value in round_record(record).items()
+        if column != "timestamp"
+    )
+
+
+def append_history(key: str, record: Dict) -> bool:
+    history = st.session_state[key]
+    if is_repeat_record(history, record):
+        return False
+    
+    add_history_row(history, key, record)
+    st.session_state["history_rev"] += 1
+    
+    path = history_path(st.session_state["history_user"], key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(round_record(record), ensure_ascii=False) + "\n")
+    return True
+
+
+def clear_history(key: str):
+    # Button callback: runs before the script, so the cleared history renders in the same rerun
+    st.session_state[key] = {}
+    st.session_state["history_rev"] += 1
+    history_path(st.session_state["history_user"], key).unlink(missing_ok=True)
+
+
+def history_records(history: Dict[str, List]) -> List[Dict]:
+    return [round_record(dict(zip(history, row))) for row in zip(*history.values())]
+
+
+def record_timestamp() -> str:
+    return datetime.now().isoformat(sep=" ", timespec="minutes")
+
+
+# ---------------------------------------------------------------------------
+# Cached Helpers
+# ---------------------------------------------------------------------------
+
+# The script module is re-executed on every rerun, so the read-only tables below are
+# built through st.cache_resource: once per server process, shared by all sessions.
+# They depend only on the constants above and are never mutated (st.data_editor copies
+# its input).
+
+@st.cache_resource(show_spinner=False)
+def method_comparison_df() -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            "Method": method.value,
+            "Typical Density": specs['typical'],
+            "Min Density": specs['density_range'][0],
+            "Max Density": specs['density_range'][1],
+            "Unit": specs['unit'],
+            "Viscosity": specs.get('viscosity', 'N/A'),
+        }
+        for method, specs in INK_SPECIFICATIONS.items()
+    ])
+
+
+@st.cache_resource(show_spinner=False)
+def base_color_summary_df() -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            "Color": color,
+            "Typical Density": data["typical_density"],
+            "Price Range": f"${data['price_range'][0]}-${data['price_range'][1]}",
+            "Pigment Content": data["pigment_content"],
+            "Lightfastness": data["lightfastness"],
+        }
+        for color, data in BASE_COLOR_SPECIFICATIONS.items()
+    ])
+
+
+@st.cache_resource(show_spinner=False)
+def base_color_reference_df() -> pd.DataFrame:
+    return pd.DataFrame([
+        {
+            "Color": color,
+            "Density": data['typical_density'],
+            "Min Price": data['price_range'][0],
+            "Max Price": data['price_range'][1],
+            "Pigment Content": data['pigment_content'],
+            "Lightfastness": data['lightfastness'],
+        }
+        for color, data in BASE_COLOR_SPECIFICATIONS.items()
+    ])
+
+
+@st.cache_resource(show_spinner=False)
+def component_editor_df() -> pd.DataFrame:
+    # Initial Pantone component grid: midpoint prices, every percentage starting at 0
+    return pd.DataFrame({
+        "Color": BASE_COLORS,
+        "Price": [BASE_COLOR_DEFAULT_PRICE[color] for color in BASE_COLORS],
+        "Percent": [0] * len(BASE_COLORS),
+    })
+
+
+def encode_csv(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def history_table(key: str) -> Tuple[pd.DataFrame, bytes]:
+    # Memoized per session on history_rev rather than st.cache_data, which would hash
+    # every record on each rerun to build its key
+    tables = st.session_state["history_tables"]
+    history_rev = st.session_state["history_rev"]
+    cached = tables.get(key)
+    if cached is None or cached[0] != history_rev:
+        # Built from the rounded records, so the table and CSV match the JSON report and log
+        df = pd.DataFrame(history_records(st.session_state[key]))
+        cached = tables[key] = (history_rev, df, encode_csv(df))
+    return cached[1], cached[2]
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def serialize_history(
+    consumption_history: Dict[str, List], pantone_history: Dict[str, List], pretty: bool = False
+) -> Tuple[datetime, bytes]:
+    # generated_at is only refreshed when the records change (cache miss); it is returned
+    # alongside the payload so the download file name carries the same timestamp
+    generated_at = datetime.now()
+    export_data = {
+        "generated_at": generated_at.isoformat(),
+        "consumption_records": history_records(consumption_history),
+        "pantone_records": history_records(pantone_history),
+    }
+    if orjson is not None:
+        payload = orjson.dumps(export_data, option=orjson.OPT_INDENT_2 if pretty else 0)
+    elif pretty:
+        payload = json.dumps(export_data, indent=2, ensure_ascii=False).encode("utf-8")
+    else:
+        payload = json.dumps(export_data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return generated_at, payload
 
 
 # ---------------------------------------------------------------------------
@@ -387,8 +743,8 @@ def render_print_method_selector() -> Tuple[PrintMethod, Dict]:
     
     method = st.selectbox(
         "Select printing method",
-        options=list(PrintMethod),
-        format_func=lambda x: x.value
+        options=PRINT_METHODS,
+        format_func=attrgetter("value")
     )
     
     specs = INK_SPECIFICATIONS[method]
@@ -416,6 +772,8 @@ def render_consumption_tab():
     **Formula:** `Area (m²) × Coverage (%) × Ink Density (g/m²) × Substrate Factor = Consumption (g)`
     """)
     
+    # Widgets that decide which inputs are shown (or their defaults) stay outside the
+    # form so they update immediately; the values themselves are batched in the form.
     col1, col2 = st.columns([1, 1])
     
     with col1:
@@ -431,21 +789,23 @@ def render_consumption_tab():
             label_visibility="collapsed"
         )
         
-        if calc_method == "Width × Height":
-            w_col, h_col = st.columns(2)
-            with w_col:
-                width = st.number_input("Width (cm)", min_value=0.01, value=21.0, step=0.1, format="%.2f")
-            with h_col:
-                height = st.number_input("Height (cm)", min_value=0.01, value=29.7, step=0.1, format="%.2f")
-            area = width * height
-            st.text(f"Area: {area:.2f} cm²")
-        else:
-            area = st.number_input("Area (cm²)", min_value=0.01, value=623.7, step=0.1, format="%.2f")
-        
-        coverage = st.slider("Ink Coverage (%)", 0, 100, 50, help="Percentage of area covered by ink")
-        
         # Density selection with method-specific defaults
         density_col1, density_col2 = st.columns([2, 1])
+        with density_col2:
+            quick_values = (
+                specs['density_range'][0],
+                specs['typical'],
+                specs['density_range'][1],
+            )
+            quick_density = st.radio(
+                "Quick Select",
+                options=quick_values,
+                index=None,
+                format_func=lambda v: f"{v:.2f}",
+                horizontal=True,
+                key=f"qd_{method.name}",
+            )
+        
         with density_col1:
             use_variant = False
             variant_name = None
@@ -458,6 +818,30 @@ def render_consumption_tab():
             else:
                 default_density = specs['typical']
             
+            if quick_density is not None:
+                default_density = quick_density
+    
+    with col2:
+        st.subheader("Substrate Factor")
+        custom_factor = st.checkbox("Custom substrate factor")
+    
+    with st.form("consumption_form", border=False):
+        form_col1, form_col2 = st.columns([1, 1])
+        
+        with form_col1:
+            if calc_method == "Width × Height":
+                w_col, h_col = st.columns(2)
+                with w_col:
+                    width = st.number_input("Width (cm)", min_value=0.01, value=21.0, step=0.1, format="%.2f")
+                with h_col:
+                    height = st.number_input("Height (cm)", min_value=0.01, value=29.7, step=0.1, format="%.2f")
+                area = width * height
+                st.text(f"Area: {area:.2f} cm²")
+            else:
+                area = st.number_input("Area (cm²)", min_value=0.01, value=623.7, step=0.1, format="%.2f")
+            
+            coverage = st.slider("Ink Coverage (%)", 0, 100, 50, help="Percentage of area covered by ink")
+            
             ink_density = st.number_input(
                 "Ink Density (g/m²)",
                 min_value=0.001,
@@ -467,59 +851,26 @@ def render_consumption_tab():
                 help=f"Range: {specs['density_range'][0]}-{specs['density_range'][1]} g/m²"
             )
         
-        with density_col2:
-            st.markdown("**Quick Select**")
-            quick_values = [
-                specs['density_range'][0],
-                specs['typical'],
-                specs['density_range'][1]
-            ]
-            for val in quick_values:
-                if st.button(f"{val:.2f}", key=f"dens_{val}"):
-                    st.session_state[f"quick_density_{method.name}"] = val
-    
-    with col2:
-        st.subheader("Production Parameters")
-        
-        quantity = st.number_input("Print Quantity", min_value=1, value=10000, step=1000)
-        ink_price = st.number_input("Ink Price (per kg)", min_value=0.01, value=150.0, step=10.0, format="%.2f")
-        waste_rate = st.slider("Waste Rate (%)", 0, 30, 5)
-        include_waste = st.checkbox("Include Waste", value=True)
+        with form_col2:
+            substrate_type = st.selectbox("Substrate Type", SUBSTRATE_LABELS)
+            substrate_factor = SUBSTRATE_FACTORS[substrate_type]
+            
+            if custom_factor:
+                substrate_factor = st.number_input("Factor", min_value=0.1, value=1.0, step=0.1, format="%.2f")
+            
+            st.markdown("---")
+            st.subheader("Production Parameters")
+            
+            quantity = st.number_input("Print Quantity", min_value=1, value=10000, step=1000)
+            ink_price = st.number_input("Ink Price (per kg)", min_value=0.01, value=150.0, step=10.0, format="%.2f")
+            waste_rate = st.slider("Waste Rate (%)", 0, 30, 5)
+            include_waste = st.checkbox("Include Waste", value=True)
         
         st.markdown("---")
-        st.subheader("Substrate Factor")
-        
-        substrate_type = st.selectbox(
-            "Substrate Type",
-            [
-                "Coated Paper (factor: 1.0)",
-                "Uncoated Paper (factor: 1.2)",
-                "Cardboard (factor: 1.3)",
-                "Plastic Film (factor: 0.9)",
-                "Metallized (factor: 0.8)",
-                "Synthetic Paper (factor: 1.0)",
-                "Security Paper (factor: 1.1)",
-            ]
-        )
-        
-        substrate_factors = {
-            "Coated Paper (factor: 1.0)": 1.0,
-            "Uncoated Paper (factor: 1.2)": 1.2,
-            "Cardboard (factor: 1.3)": 1.3,
-            "Plastic Film (factor: 0.9)": 0.9,
-            "Metallized (factor: 0.8)": 0.8,
-            "Synthetic Paper (factor: 1.0)": 1.0,
-            "Security Paper (factor: 1.1)": 1.1,
-        }
-        substrate_factor = substrate_factors[substrate_type]
         
-        custom_factor = st.checkbox("Custom substrate factor")
-        if custom_factor:
-            substrate_factor = st.number_input("Factor", min_value=0.1, value=1.0, step=0.1, format="%.2f")
-    
-    st.markdown("---")
+        submitted = st.form_submit_button("Calculate", type="primary", use_container_width=True)
     
-    if st.button("Calculate", type="primary", use_container_width=True):
+    if submitted:
         result = ConsumptionResult(
             print_method=method,
             area_cm2=area,
@@ -532,9 +883,10 @@ def render_consumption_tab():
             substrate_factor=substrate_factor,
         )
         
-        st.session_state["consumption_history"].append(result.to_dict())
-        
-        st.success("Calculation Complete")
+        if append_history("consumption_history", result.to_dict(record_timestamp())):
+            st.success("Calculation Complete")
+        else:
+            st.success("Calculation Complete (same inputs as the last record, not added to history)")
         
         metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
         metric_col1.metric("Per Print", f"{result.actual_consumption_g:.3f} g")
@@ -545,22 +897,9 @@ def render_consumption_tab():
         with st.expander("Calculation Details"):
             detail_col1, detail_col2 = st.columns(2)
             with detail_col1:
-                st.markdown(f"""
-                **Method:** {method.value}
-                **Area:** {result.area_cm2:.2f} cm² ({result.area_m2:.6f} m²)
-                **Coverage:** {result.coverage}%
-                **Ink Density:** {result.ink_density} g/m²
-                **Substrate Factor:** {result.substrate_factor}
-                **Waste Rate:** {result.waste_rate}%
-                """)
+                st.markdown(CALCULATION_DETAILS_LEFT_MD.format(r=result))
             with detail_col2:
-                st.markdown(f"""
-                **Quantity:** {result.quantity:,}
-                **Ink Price:** ${result.ink_price_per_kg:.2f}/kg
-                **Formula:** {result.area_m2:.6f} × {result.coverage/100} × {result.ink_density} × {result.substrate_factor}
-                **Base Consumption:** {result.base_consumption_g:.4f} g
-                **With Waste:** {result.actual_consumption_g:.4f} g
-                """)
+                st.markdown(CALCULATION_DETAILS_RIGHT_MD.format(r=result, coverage_fraction=result.coverage / 100))
 
 
 def render_pantone_tab():
@@ -575,64 +914,42 @@ def render_pantone_tab():
         
         # Display base color specs
         with st.expander("View Base Color Technical Data"):
-            base_df = []
-            for color, data in BASE_COLOR_SPECIFICATIONS.items():
-                base_df.append({
-                    "Color": color,
-                    "Typical Density": data["typical_density"],
-                    "Price Range": f"${data['price_range'][0]}-${data['price_range'][1]}",
-                    "Pigment Content": data["pigment_content"],
-                    "Lightfastness": data["lightfastness"],
-                })
-            st.dataframe(pd.DataFrame(base_df), hide_index=True, use_container_width=True)
-        
-        colors = list(BASE_COLOR_SPECIFICATIONS.keys())
-        
-        st.markdown("---")
-        st.subheader("Component Pricing")
-        
-        price_cols = st.columns(4)
-        unit_prices = {}
-        
-        for i, color in enumerate(colors):
-            with price_cols[i % 4]:
-                default_price = (BASE_COLOR_SPECIFICATIONS[color]["price_range"][0] + 
-                               BASE_COLOR_SPECIFICATIONS[color]["price_range"][1]) / 2
-                unit_prices[color] = st.number_input(
-                    f"{color}",
-                    min_value=1.0,
-                    value=float(default_price),
-                    step=5.0,
-                    format="%.2f",
-                    key=f"price_{color}"
-                )
+            st.dataframe(base_color_summary_df(), hide_index=True, use_container_width=True)
         
         st.markdown("---")
         st.subheader("Mixture Formula")
         
-        mixture_name = st.text_input("Mixture Name", value="Pantone 185 C")
-        total_weight = st.number_input("Total Weight (kg)", min_value=0.001, value=5.0, step=0.5, format="%.3f")
-        
-        st.markdown("**Component Percentages:**")
-        
-        pct_cols = st.columns(4)
-        components = {}
-        
-        # Default values for 185 C
-        defaults_185c = {"C": 0, "M": 80, "Y": 90, "K": 0, "Orange": 0, "Green": 0, "Violet": 0, "Special": 0}
+        # Edits are applied on submit; until then the cost panel keeps the last submitted values
+        with st.form("pantone_form", border=False):
+            mixture_name = st.text_input("Mixture Name", value="Pantone 185 C")
+            total_weight = st.number_input("Total Weight (kg)", min_value=0.001, value=5.0, step=0.5, format="%.3f")
+            
+            st.markdown("**Component Pricing & Percentages:**")
+            
+            # One grid instead of a price and a percentage input per base color
+            edited = st.data_editor(
+                component_editor_df(),
+                key="pantone_components",
+                num_rows="fixed",
+                disabled=("Color",),
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "Price": st.column_config.NumberColumn(
+                        "Unit Price (per kg)", min_value=1.0, step=5.0, format="%.2f", required=True
+                    ),
+                    "Percent": st.column_config.NumberColumn(
+                        "Percentage (%)", min_value=0, max_value=100, step=5, required=True
+                    ),
+                },
+            )
+            
+            st.form_submit_button("Update Mixture", use_container_width=True)
         
-        for i, color in enumerate(colors):
-            with pct_cols[i % 4]:
-                components[color] = st.number_input(
-                    f"{color} %",
-                    min_value=0,
-                    max_value=100,
-                    value=defaults_185c.get(color, 0),
-                    step=5,
-                    key=f"pct_{color}"
-                )
+        prices = edited["Price"].tolist()
+        percentages = edited["Percent"].tolist()
         
-        total_pct = sum(components.values())
+        total_pct = sum(percentages)
         if total_pct != 100:
             st.warning(f"Total: {total_pct}% (must be 100%)")
         else:
@@ -645,8 +962,9 @@ def render_pantone_tab():
             mixture = PantoneMixture(
                 name=mixture_name,
                 total_kg=total_weight,
-                components=components,
-                unit_prices=unit_prices,
+                colors=BASE_COLORS,
+                percentages=tuple(percentages),
+                prices=tuple(prices),
             )
             
             costs = mixture.calculate_costs()
@@ -655,17 +973,13 @@ def render_pantone_tab():
                 st.dataframe(df, use_container_width=True, hide_index=True)
                 
                 st.markdown("---")
-                st.markdown(f"""
-**{mixture.name}**
-
-Total Cost: **${mixture.total_cost:,.2f}**
-
-Unit Cost: **${mixture.unit_cost:,.2f}/kg**
-                """)
+                st.markdown(MIXTURE_SUMMARY_MD.format(m=mixture))
                 
                 if st.button("Save Mixture", use_container_width=True):
-                    st.session_state["pantone_history"].append(mixture.to_dict())
-                    st.success("Saved")
+                    if append_history("pantone_history", mixture.to_dict(record_timestamp())):
+                        st.success("Saved")
+                    else:
+                        st.info("Already saved")
     
     # Preset formulas
     with st.expander("Preset Pantone Formulas"):
@@ -673,73 +987,39 @@ Unit Cost: **${mixture.unit_cost:,.2f}/kg**
         
         with preset_col1:
             st.markdown("**Standard Formulas:**")
-            for name, formula in list(DEFAULT_PANTONE_FORMULAS.items())[:4]:
-                active_components = {k: v for k, v in formula.items() if v > 0}
-                st.text(f"{name}: {active_components}")
+            for line in PRESET_STANDARD_LINES:
+                st.text(line)
         
         with preset_col2:
             st.markdown("**Process Colors:**")
-            for name, formula in list(DEFAULT_PANTONE_FORMULAS.items())[4:]:
-                active_components = {k: v for k, v in formula.items() if v > 0}
-                st.text(f"{name}: {active_components}")
+            for line in PRESET_PROCESS_LINES:
+                st.text(line)
 
 
 def render_reference_tab():
     st.header("Technical Reference Data")
     
-    tab1, tab2, tab3 = st.tabs(["Print Methods", "Ink Specifications", "Coverage Guidelines"])
+    tab1, tab2, tab3 = st.tabs(REFERENCE_TAB_LABELS)
     
     with tab1:
         st.subheader("Print Method Comparison")
         
-        comparison_data = []
-        for method, specs in INK_SPECIFICATIONS.items():
-            comparison_data.append({
-                "Method": method.value,
-                "Typical Density": specs['typical'],
-                "Min Density": specs['density_range'][0],
-                "Max Density": specs['density_range'][1],
-                "Unit": specs['unit'],
-                "Viscosity": specs.get('viscosity', 'N/A'),
-            })
-        
-        df_comparison = pd.DataFrame(comparison_data)
-        st.dataframe(df_comparison, hide_index=True, use_container_width=True)
+        st.dataframe(method_comparison_df(), hide_index=True, use_container_width=True)
         
         st.markdown("---")
         st.subheader("Method Descriptions")
         
-        for method, specs in INK_SPECIFICATIONS.items():
-            with st.expander(f"{method.value}"):
-                st.markdown(f"""
-**Description:** {specs['description']}
-
-**Technical Data:**
-- Density Range: {specs['density_range'][0]} - {specs['density_range'][1]} {specs['unit']}
-- Typical Value: {specs['typical']} {specs['unit']}
-- Viscosity: {specs.get('viscosity', 'N/A')}
-                """)
+        for method in PRINT_METHODS:
+            with st.expander(method.value):
+                st.markdown(METHOD_DESCRIPTION_MD[method])
                 
-                if 'variants' in specs:
-                    st.markdown("**Variants:**")
-                    for variant, data in specs['variants'].items():
-                        st.markdown(f"- **{variant}:** Density {data['density'][0]}-{data['density'][1]} g/m²")
+                if method in METHOD_VARIANTS_MD:
+                    st.markdown(METHOD_VARIANTS_MD[method])
     
     with tab2:
         st.subheader("Base Color Specifications")
         
-        base_data = []
-        for color, data in BASE_COLOR_SPECIFICATIONS.items():
-            base_data.append({
-                "Color": color,
-                "Density": data['typical_density'],
-                "Min Price": data['price_range'][0],
-                "Max Price": data['price_range'][1],
-                "Pigment Content": data['pigment_content'],
-                "Lightfastness": data['lightfastness'],
-            })
-        
-        st.dataframe(pd.DataFrame(base_data), hide_index=True, use_container_width=True)
+        st.dataframe(base_color_reference_df(), hide_index=True, use_container_width=True)
     
     with tab3:
         st.subheader("Coverage Guidelines")
@@ -775,19 +1055,24 @@ def render_reference_tab():
         """)
 
 
+# A fragment: its own buttons (clear, prepare report) rerun only this tab, not the whole app
+@st.fragment
 def render_history_tab():
     st.header("History & Export")
     
+    consumption_history = st.session_state["consumption_history"]
+    pantone_history = st.session_state["pantone_history"]
+    history_rev = st.session_state["history_rev"]
+    
     hist_col1, hist_col2 = st.columns(2)
     
     with hist_col1:
         st.subheader("Consumption Records")
         
-        if st.session_state["consumption_history"]:
-            df = pd.DataFrame(st.session_state["consumption_history"])
+        if consumption_history:
+            df, csv = history_table("consumption_history")
             st.dataframe(df, use_container_width=True, hide_index=True)
             
-            csv = df.to_csv(index=False).encode("utf-8-sig")
             st.download_button(
                 "Download Consumption CSV",
                 csv,
@@ -796,20 +1081,22 @@ def render_history_tab():
                 use_container_width=True
             )
             
-            if st.button("Clear Consumption History", use_container_width=True):
-                st.session_state["consumption_history"] = []
-                st.rerun()
+            st.button(
+                "Clear Consumption History",
+                on_click=clear_history,
+                args=("consumption_history",),
+                use_container_width=True
+            )
         else:
             st.text("No records")
     
     with hist_col2:
         st.subheader("Pantone Records")
         
-        if st.session_state["pantone_history"]:
-            df = pd.DataFrame(st.session_state["pantone_history"])
+        if pantone_history:
+            df, csv = history_table("pantone_history")
             st.dataframe(df, use_container_width=True, hide_index=True)
             
-            csv = df.to_csv(index=False).encode("utf-8-sig")
             st.download_button(
                 "Download Pantone CSV",
                 csv,
@@ -818,31 +1105,42 @@ def render_history_tab():
                 use_container_width=True
             )
             
-            if st.button("Clear Pantone History", use_container_width=True):
-                st.session_state["pantone_history"] = []
-                st.rerun()
+            st.button(
+                "Clear Pantone History",
+                on_click=clear_history,
+                args=("pantone_history",),
+                use_container_width=True
+            )
         else:
             st.text("No records")
     
     st.markdown("---")
     st.subheader("Full Export")
     
-    if st.session_state["consumption_history"] or st.session_state["pantone_history"]:
-        export_data = {
-            "generated_at": datetime.now().isoformat(),
-            "consumption_records": st.session_state["consumption_history"],
-            "pantone_records": st.session_state["pantone_history"],
-        }
+    if consumption_history or pantone_history:
+        pretty = st.checkbox("Pretty-print JSON", value=False)
         
-        json_data = json.dumps(export_data, indent=2, ensure_ascii=False)
+        # Encoding the whole history is only done on request, and only if it changed since
+        if st.button("Prepare Report", use_container_width=True):
+            if st.session_state.get("report_key") != (history_rev, pretty):
+                generated_at, report_json = serialize_history(
+                    consumption_history,
+                    pantone_history,
+                    pretty,
+                )
+                st.session_state["report_json"] = report_json
+                st.session_state["report_generated_at"] = generated_at
+                st.session_state["report_key"] = (history_rev, pretty)
         
-        st.download_button(
-            "Download Full Report (JSON)",
-            json_data,
-            f"ink_calculator_report_{datetime.now():%Y%m%d_%H%M%S}.json",
-            "application/json",
-            use_container_width=True
-        )
+        # A report prepared before the latest history change, or in the other format, is stale
+        if st.session_state.get("report_key") == (history_rev, pretty):
+            st.download_button(
+                "Download Full Report (JSON)",
+                st.session_state["report_json"],
+                f"ink_calculator_report_{st.session_state['report_generated_at']:%Y%m%d_%H%M%S}.json",
+                "application/json",
+                use_container_width=True
+            )
 
 
 # ---------------------------------------------------------------------------
@@ -853,12 +1151,7 @@ def main():
     init_session_state()
     render_header()
     
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "Consumption", 
-        "Pantone Mix", 
-        "Reference Data",
-        "History"
-    ])
+    tab1, tab2, tab3, tab4 = st.tabs(TAB_LABELS)
     
     with tab1:
         render_consumption_tab()
@@ -873,7 +1166,7 @@ def main():
         render_history_tab()
     
     st.markdown("---")
-    st.caption("Ink Consumption Calculator | Formula: Area × Coverage × Density × Substrate Factor")
+    st.caption(FOOTER_CAPTION)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,7 @@
 cd /d "%~dp0"
 
 python -m venv ink_calculator_env
-ink_calculator_env\Scripts\pip install streamlit pandas
+ink_calculator_env\Scripts\pip install streamlit pandas numpy
 
 echo.
 echo Installation complete. Run start.bat to launch.